@@ -0,0 +1,61 @@
+import argparse
+import subprocess
+import sys
+import time
+
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+heavy = [name for name in ("pandas", "duckdb") if name in sys.modules]
+print(f"{elapsed:.4f} {','.join(heavy) or '-'}")
+"""
+
+
+def measure_import(runs):
+    """
+    Time `import main` in fresh interpreters, so every run is a cold import.
+
+    Returns:
+        tuple: (best import time in seconds, heavy modules loaded by the import).
+    """
+    timings, heavy = [], "-"
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True, check=True
+        ).stdout.split()
+        timings.append(float(output[0]))
+        heavy = output[1]
+    return min(timings), heavy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report API import time and first-request latency.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold imports to time")
+    parser.add_argument("--path", action="append", default=None,
+                        help="Endpoint to request, can be repeated (default: / and /sensors/stats/)")
+    args = parser.parse_args()
+    paths = args.path or ["/", "/sensors/stats/"]
+
+    import_time, heavy = measure_import(args.runs)
+    print(f"import main (best of {args.runs}): {import_time * 1000:.1f} ms")
+    print(f"heavy modules loaded at import: {heavy}")
+
+    # TestClient needs httpx, which is only required for this benchmark
+    from fastapi.testclient import TestClient
+    import main
+
+    start = time.perf_counter()
+    app = main.create_app()
+    print(f"create_app: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    with TestClient(app) as client:
+        print(f"startup incl. pool warm-up: {(time.perf_counter() - start) * 1000:.1f} ms")
+        for path in paths:
+            for label in ("first", "second"):
+                start = time.perf_counter()
+                response = client.get(path)
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"{label} request {path}: {elapsed:.1f} ms (HTTP {response.status_code})")
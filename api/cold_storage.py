@@ -0,0 +1,238 @@
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta, date
+from typing import List, Optional, TYPE_CHECKING
+
+from sqlalchemy import text
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# duckdb and pandas are imported on first use, so API instances without a cold tier never load them
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["id", "sensor_id", "timestamp", "value", "lat", "lng", "unit", "type", "description"]
+
+
+def _connect():
+    """
+    Open an in-memory DuckDB connection, importing DuckDB on first use.
+    """
+    import duckdb
+    return duckdb.connect()
+
+
+class ColdStorage:
+    """
+    Columnar cold-storage tier for raw sensor readings.
+
+    Readings are stored as Parquet files partitioned by day and sensor,
+    e.g. `<path>/date=2024-06-14/sensor_id=3/part_<min_id>_<max_id>_0.parquet`,
+    and queried with DuckDB. Partitions outside the requested time range and
+    sensor set are pruned from the directory listing before any file is opened.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def _partition_files(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                         sensor_ids: Optional[List[int]] = None) -> List[str]:
+        """
+        List the Parquet files of the partitions that may hold matching readings.
+        """
+        if not os.path.isdir(self.path):
+            return []
+
+        files = []
+        for date_dir in sorted(os.listdir(self.path)):
+            if not date_dir.startswith("date="):
+                continue
+            day = date.fromisoformat(date_dir[len("date="):])
+            if start_time and day < start_time.date():
+                continue
+            if end_time and day > end_time.date():
+                continue
+            for sensor_dir in sorted(os.listdir(os.path.join(self.path, date_dir))):
+                if not sensor_dir.startswith("sensor_id="):
+                    continue
+                if sensor_ids is not None and int(sensor_dir[len("sensor_id="):]) not in sensor_ids:
+                    continue
+                partition = os.path.join(self.path, date_dir, sensor_dir)
+                files.extend(
+                    os.path.join(partition, f) for f in sorted(os.listdir(partition)) if f.endswith(".parquet")
+                )
+        return files
+
+    def _where(self, start_time, end_time, sensor_ids, type, unit):
+        clauses, params = [], []
+        if start_time:
+            clauses.append("timestamp >= ?")
+            params.append(start_time)
+        if end_time:
+            clauses.append("timestamp <= ?")
+            params.append(end_time)
+        if sensor_ids is not None:
+            clauses.append(f"sensor_id IN ({', '.join('?' for _ in sensor_ids)})")
+            params.extend(sensor_ids)
+        if type:
+            clauses.append("type = ?")
+            params.append(type)
+        if unit:
+            clauses.append("unit = ?")
+            params.append(unit)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+              sensor_ids: Optional[List[int]] = None, type: Optional[str] = None, unit: Optional[str] = None) -> int:
+        """
+        Count the cold readings matching the filters.
+        """
+        files = self._partition_files(start_time, end_time, sensor_ids)
+        if not files:
+            return 0
+        where, params = self._where(start_time, end_time, sensor_ids, type, unit)
+        with _connect() as con:
+            return con.execute(
+                f"SELECT count(*) FROM read_parquet(?, hive_partitioning = true){where}", [files] + params
+            ).fetchone()[0]
+
+    def query(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+              sensor_ids: Optional[List[int]] = None, type: Optional[str] = None, unit: Optional[str] = None,
+              skip: int = 0, limit: int = 100) -> List[dict]:
+        """
+        Retrieve cold readings matching the filters, ordered by ID.
+        """
+        files = self._partition_files(start_time, end_time, sensor_ids)
+        if not files:
+            return []
+        where, params = self._where(start_time, end_time, sensor_ids, type, unit)
+        with _connect() as con:
+            cursor = con.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM read_parquet(?, hive_partitioning = true){where} "
+                f"ORDER BY id LIMIT ? OFFSET ?",
+                [files] + params + [limit, skip]
+            )
+            return [dict(zip(COLUMNS, row)) for row in cursor.fetchall()]
+
+    def aggregate(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                  sensor_ids: Optional[List[int]] = None) -> List[dict]:
+        """
+        Compute per-sensor count, sum, min, max and first/last timestamps of the cold readings.
+        """
+        files = self._partition_files(start_time, end_time, sensor_ids)
+        if not files:
+            return []
+        where, params = self._where(start_time, end_time, sensor_ids, None, None)
+        fields = ["sensor_id", "count", "sum_value", "min_value", "max_value", "first_seen", "last_seen"]
+        with _connect() as con:
+            cursor = con.execute(
+                "SELECT sensor_id, count(*), sum(value), min(value), max(value), min(timestamp), max(timestamp) "
+                f"FROM read_parquet(?, hive_partitioning = true){where} GROUP BY sensor_id",
+                [files] + params
+            )
+            return [dict(zip(fields, row)) for row in cursor.fetchall()]
+
+    def latest_per_sensor(self, sensor_ids: Optional[List[int]] = None, type: Optional[str] = None,
+                          unit: Optional[str] = None, start_time: Optional[datetime] = None,
+                          end_time: Optional[datetime] = None, limit: int = 100) -> List[dict]:
+        """
+        Retrieve the latest `limit` cold readings of every matching sensor in one query.
+        """
+        files = self._partition_files(start_time, end_time, sensor_ids)
+        if not files:
+            return []
+        where, params = self._where(start_time, end_time, sensor_ids, type, unit)
+        with _connect() as con:
+            cursor = con.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM read_parquet(?, hive_partitioning = true){where} "
+                "QUALIFY row_number() OVER (PARTITION BY sensor_id ORDER BY timestamp DESC, id DESC) <= ? "
+                "ORDER BY sensor_id, timestamp",
+                [files] + params + [limit]
+            )
+            return [dict(zip(COLUMNS, row)) for row in cursor.fetchall()]
+
+    def write(self, df: "pd.DataFrame"):
+        """
+        Write a batch of raw readings into the day/sensor partitions.
+
+        The file name is derived from the batch's ID range, so rewriting the same
+        batch after an interrupted compaction overwrites instead of duplicating it.
+        """
+        df = df.assign(date=df["timestamp"].dt.strftime("%Y-%m-%d"))
+        min_id, max_id = int(df["id"].min()), int(df["id"].max())
+        os.makedirs(self.path, exist_ok=True)
+        with _connect() as con:
+            con.register("batch", df)
+            con.execute(
+                f"COPY (SELECT {', '.join(COLUMNS)}, date FROM batch) TO '{self.path}' "
+                f"(FORMAT PARQUET, PARTITION_BY (date, sensor_id), "
+                f"FILENAME_PATTERN 'part_{min_id}_{max_id}_{{i}}', OVERWRITE_OR_IGNORE true)"
+            )
+
+
+def compact(engine, cold_storage: ColdStorage, older_than: timedelta):
+    """
+    Move raw readings older than `older_than` from MySQL into the cold tier, one day at a time.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): Engine connected to the MySQL database.
+        cold_storage (ColdStorage): The cold tier to write to.
+        older_than (timedelta): Minimum age of the readings to move.
+    """
+    import pandas as pd
+
+    cutoff = datetime.utcnow() - older_than
+    with engine.connect() as conn:
+        oldest = conn.execute(text("SELECT MIN(timestamp) FROM sensor_data")).scalar()
+    if oldest is None or oldest >= cutoff:
+        logger.info("Nothing to compact")
+        return
+
+    day_start = datetime.combine(oldest.date(), datetime.min.time())
+    while day_start < cutoff:
+        day_end = min(day_start + timedelta(days=1), cutoff)
+        params = {"start": day_start, "end": day_end}
+        df = pd.read_sql(
+            text(f"SELECT {', '.join(COLUMNS)} FROM sensor_data "
+                 "WHERE timestamp >= :start AND timestamp < :end ORDER BY id"),
+            engine, params=params
+        )
+        if not df.empty:
+            cold_storage.write(df)
+            # Rows inserted after the read have a higher ID and are left for the next run
+            batch = dict(params, min_id=int(df["id"].min()), max_id=int(df["id"].max()))
+            with engine.begin() as conn:
+                # Keep the removed readings in the lifetime totals of sensor_stats, in the same
+                # transaction as the delete so they are archived exactly once
+                conn.execute(text("""
+                    INSERT INTO sensor_stats_archive (source, sensor_id, reading_count, sum_value,
+                        min_value, max_value, first_seen, last_seen)
+                    SELECT * FROM (
+                        SELECT CONCAT('cold_storage:', :min_id, '-', :max_id) AS source, sensor_id,
+                               COUNT(*) AS reading_count, SUM(value) AS sum_value,
+                               MIN(value) AS min_value, MAX(value) AS max_value,
+                               MIN(timestamp) AS first_seen, MAX(timestamp) AS last_seen
+                        FROM sensor_data
+                        WHERE timestamp >= :start AND timestamp < :end AND id <= :max_id
+                        GROUP BY sensor_id
+                    ) AS removed
+                """), batch)
+                conn.execute(
+                    text("DELETE FROM sensor_data WHERE timestamp >= :start AND timestamp < :end "
+                         "AND id <= :max_id"),
+                    batch
+                )
+            logger.info(f"Compacted {len(df)} readings from {day_start.date()} into cold storage")
+        day_start = day_end
+
+
+if __name__ == "__main__":
+    from main import create_db_engine, cold_storage
+
+    parser = argparse.ArgumentParser(description="Move old raw readings from MySQL into Parquet cold storage.")
+    parser.add_argument("--older-than-days", type=int, default=int(os.environ.get("COLD_STORAGE_AGE_DAYS", "30")),
+                        help="Minimum age in days of the readings to move")
+    args = parser.parse_args()
+
+    compact(create_db_engine(), cold_storage, timedelta(days=args.older_than_days))
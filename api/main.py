@@ -1,39 +1,34 @@
 from fastapi import FastAPI, HTTPException, Query, Depends, Request
-from sqlalchemy import create_engine, Column, Integer, Float, DateTime, String, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, Float, DateTime, String, Boolean, ForeignKey, func, case
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 import os
-import pandas as pd
 import urllib.parse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
+from typing import List, Literal, Optional, Union
+from datetime import datetime, timedelta
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import logging
 from fastapi import APIRouter
-from sqlalchemy.orm import Session
-import pandas as pd
+from cold_storage import ColdStorage
+from spatial import SensorGrid
 
 router = APIRouter()
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Database connection setup
-USER = os.environ.get("MYSQL_USER")
-PASSWORD = os.environ.get("MYSQL_PASSWORD")
-DATABASE = os.environ.get("MYSQL_DATABASE")
-HOST = os.environ.get("MYSQL_HOST")
-PASSWORD = urllib.parse.quote_plus(PASSWORD)
-DATABASE_URL = f"mysql+mysqlconnector://{USER}:{PASSWORD}@{HOST}:3306/{DATABASE}"
-
-# SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# SQLAlchemy setup, the engine is bound by create_app
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
 
+# Cold tier holding raw readings compacted out of MySQL
+COLD_STORAGE_PATH = os.environ.get("COLD_STORAGE_PATH", "cold_data")
+cold_storage = ColdStorage(COLD_STORAGE_PATH)
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -64,6 +59,38 @@ class AggregatedData(Base):
     type = Column(String(50), nullable=False)
     description = Column(String(255), nullable=False)
 
+class DataQualityWindow(Base):
+    __tablename__ = "sensor_data_quality"
+    id = Column(Integer, primary_key=True, index=True)
+    sensor_id = Column(Integer, nullable=False)
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False)
+    expected_count = Column(Integer, nullable=False)
+    received_count = Column(Integer, nullable=False)
+    missing_count = Column(Integer, nullable=False)
+    gap_count = Column(Integer, nullable=False)
+    max_gap_ms = Column(Float, nullable=False)
+    stale = Column(Boolean, nullable=False)
+    out_of_range_count = Column(Integer, nullable=False)
+    duplicate_count = Column(Integer, nullable=False)
+    clock_skew_count = Column(Integer, nullable=False)
+    max_clock_skew_ms = Column(Float, nullable=False)
+
+class SensorStats(Base):
+    __tablename__ = "sensor_stats"
+    sensor_id = Column(Integer, primary_key=True)
+    lat = Column(Float)
+    lng = Column(Float)
+    unit = Column(String(255))
+    type = Column(String(255))
+    description = Column(String(255))
+    reading_count = Column(Integer, nullable=False)
+    sum_value = Column(Float, nullable=False)
+    min_value = Column(Float)
+    max_value = Column(Float)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+
 class Metadata(Base):
     __tablename__ = "metadata"
     id = Column(Integer, primary_key=True, index=True)
@@ -103,6 +130,50 @@ class AggregatedDataModel(BaseModel):
     class Config:
         orm_mode = True
 
+class DataQualityWindowModel(BaseModel):
+    id: int
+    sensor_id: int
+    window_start: datetime
+    window_end: datetime
+    expected_count: int
+    received_count: int
+    missing_count: int
+    gap_count: int
+    max_gap_ms: float
+    stale: bool
+    out_of_range_count: int
+    duplicate_count: int
+    clock_skew_count: int
+    max_clock_skew_ms: float
+
+    class Config:
+        orm_mode = True
+
+class SensorAggregateModel(BaseModel):
+    sensor_id: int
+    lat: Optional[float]
+    lng: Optional[float]
+    count: int
+    min_value: float
+    max_value: float
+    avg_value: float
+    first_seen: datetime
+    last_seen: datetime
+
+class SensorStatsModel(BaseModel):
+    sensor_id: int
+    lat: Optional[float]
+    lng: Optional[float]
+    unit: Optional[str]
+    type: Optional[str]
+    description: Optional[str]
+    reading_count: int
+    avg_value: Optional[float]
+    min_value: Optional[float]
+    max_value: Optional[float]
+    first_seen: Optional[datetime]
+    last_seen: Optional[datetime]
+
 class MetadataModel(BaseModel):
     id: int
     dataset_name: str
@@ -115,8 +186,64 @@ class MetadataModel(BaseModel):
     class Config:
         orm_mode = True
 
-# Initialize FastAPI application
-app = FastAPI()
+def create_db_engine():
+    """
+    Create the SQLAlchemy engine with pool settings taken from the environment.
+    - **DB_POOL_SIZE**: Number of connections kept open (default 5)
+    - **DB_MAX_OVERFLOW**: Extra connections allowed under load (default 10)
+    - **DB_POOL_TIMEOUT**: Seconds to wait for a free connection (default 30)
+    - **DB_POOL_RECYCLE**: Seconds after which connections are replaced, below the server idle timeout (default 1800)
+    - **DB_POOL_PRE_PING**: Check connections before use so stale ones are replaced (default true)
+    """
+    password = urllib.parse.quote_plus(os.environ.get("MYSQL_PASSWORD"))
+    database_url = (
+        f"mysql+mysqlconnector://{os.environ.get('MYSQL_USER')}:{password}"
+        f"@{os.environ.get('MYSQL_HOST')}:3306/{os.environ.get('MYSQL_DATABASE')}"
+    )
+    return create_engine(
+        database_url,
+        pool_size=int(os.environ.get("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=int(os.environ.get("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+        pool_pre_ping=os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true",
+    )
+
+def warm_up_pool(engine, connections: int):
+    """
+    Open `connections` pooled connections up front so the first requests don't pay for the handshake.
+    """
+    opened = []
+    try:
+        for _ in range(min(connections, engine.pool.size())):
+            opened.append(engine.connect())
+    except Exception as e:
+        logger.warning(f"Warmed up {len(opened)} of {connections} database connections: {e}")
+    finally:
+        for conn in opened:
+            conn.close()
+
+def create_app() -> FastAPI:
+    """
+    Build the FastAPI application and bind the database engine.
+
+    Run with `uvicorn main:create_app --factory`. The pool is warmed up with
+    DB_POOL_WARMUP connections (default 2) when the application starts.
+    """
+    engine = create_db_engine()
+    SessionLocal.configure(bind=engine)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        warm_up_pool(engine, int(os.environ.get("DB_POOL_WARMUP", "2")))
+        yield
+        engine.dispose()
+
+    app = FastAPI(lifespan=lifespan)
+    # Mount static files
+    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.include_router(router)
+    return app
 
 # Dependency to get the SQLAlchemy session
 def get_db():
@@ -126,13 +253,89 @@ def get_db():
     finally:
         db.close()
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+def read_federated(query, skip: int, limit: int, **filters):
+    """
+    Page through raw readings across the cold tier and MySQL.
+
+    Cold readings are always older than the ones still in MySQL, so they come
+    first; the hot query only fills whatever the cold page left over.
+    """
+    cold_count = cold_storage.count(**filters)
+    data = cold_storage.query(skip=skip, limit=limit, **filters) if skip < cold_count else []
+    if len(data) < limit:
+        data += query.order_by(SensorData.id).offset(max(0, skip - cold_count)).limit(limit - len(data)).all()
+    return data
+
+def load_sensor_locations():
+    """
+    Load the location of every sensor from the sensor statistics maintained by the ingester.
+    """
+    db = SessionLocal()
+    try:
+        return db.query(SensorStats.sensor_id, SensorStats.lat, SensorStats.lng).all()
+    finally:
+        db.close()
+
+# Spatial index of sensor locations, reloaded every SPATIAL_INDEX_TTL_S seconds
+sensor_grid = SensorGrid(load_sensor_locations, ttl_s=float(os.environ.get("SPATIAL_INDEX_TTL_S", "300")))
+
+def read_spatial(db: Session, sensor_ids: List[int], start_time: Optional[datetime], end_time: Optional[datetime],
+                 aggregate: bool, skip: int, limit: int):
+    """
+    Retrieve raw readings or per-sensor aggregates for the sensors resolved from the spatial index.
+    """
+    if not sensor_ids:
+        return []
+
+    query = db.query(SensorData).filter(SensorData.sensor_id.in_(sensor_ids))
+    if start_time:
+        query = query.filter(SensorData.timestamp >= start_time)
+    if end_time:
+        query = query.filter(SensorData.timestamp <= end_time)
+
+    if not aggregate:
+        return read_federated(query, skip, limit, sensor_ids=sensor_ids, start_time=start_time, end_time=end_time)
+
+    hot = query.with_entities(
+        SensorData.sensor_id,
+        func.count(SensorData.id).label("count"),
+        func.sum(SensorData.value).label("sum_value"),
+        func.min(SensorData.value).label("min_value"),
+        func.max(SensorData.value).label("max_value"),
+        func.min(SensorData.timestamp).label("first_seen"),
+        func.max(SensorData.timestamp).label("last_seen"),
+    ).group_by(SensorData.sensor_id).all()
+
+    # Merge the partial aggregates of both tiers per sensor
+    merged = {}
+    for row in [r._asdict() for r in hot] + cold_storage.aggregate(start_time, end_time, sensor_ids):
+        current = merged.get(row["sensor_id"])
+        if current is None:
+            merged[row["sensor_id"]] = dict(row)
+            continue
+        current["count"] += row["count"]
+        current["sum_value"] += row["sum_value"]
+        current["min_value"] = min(current["min_value"], row["min_value"])
+        current["max_value"] = max(current["max_value"], row["max_value"])
+        current["first_seen"] = min(current["first_seen"], row["first_seen"])
+        current["last_seen"] = max(current["last_seen"], row["last_seen"])
+
+    results = []
+    for sensor_id in sorted(merged)[skip:skip + limit]:
+        row = merged[sensor_id]
+        lat, lng = sensor_grid.locations.get(sensor_id, (None, None))
+        results.append(SensorAggregateModel(
+            sensor_id=sensor_id, lat=lat, lng=lng, count=row["count"],
+            min_value=row["min_value"], max_value=row["max_value"],
+            avg_value=float(row["sum_value"]) / row["count"],
+            first_seen=row["first_seen"], last_seen=row["last_seen"],
+        ))
+    return results
 
 # Set up templates directory
 templates = Jinja2Templates(directory="templates")
 
-@app.get("/")
+@router.get("/")
 def read_root(request: Request):
     """
     Root endpoint to serve the home page.
@@ -140,7 +343,7 @@ def read_root(request: Request):
     return "API up and running. Query data or go to `/docs/` for documentation"
 
 
-@app.get("/data/", response_model=List[SensorDataModel])
+@router.get("/data/", response_model=List[SensorDataModel])
 def read_data(skip: int = 0, limit: int = Query(default=100, le=1000), db: Session = Depends(get_db)):
     """
     Retrieve sensor data with pagination.
@@ -155,7 +358,7 @@ def read_data(skip: int = 0, limit: int = Query(default=100, le=1000), db: Sessi
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@app.get("/aggregated_data/", response_model=List[AggregatedDataModel])
+@router.get("/aggregated_data/", response_model=List[AggregatedDataModel])
 def read_data(skip: int = 0, limit: int = Query(default=100, le=1000), db: Session = Depends(get_db)):
     """
     Retrieve sensor data with pagination.
@@ -169,7 +372,7 @@ def read_data(skip: int = 0, limit: int = Query(default=100, le=1000), db: Sessi
         logger.error(f"Error retrieving data: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-@app.get("/metadata/", response_model=List[MetadataModel])
+@router.get("/metadata/", response_model=List[MetadataModel])
 def read_metadata(db: Session = Depends(get_db)):
     """
     Retrieve metadata for all datasets.
@@ -182,7 +385,7 @@ def read_metadata(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@app.get("/data/catalog/")
+@router.get("/data/catalog/")
 def read_data_catalog(request: Request):
     """
     Endpoint to serve the data catalog page.
@@ -190,7 +393,7 @@ def read_data_catalog(request: Request):
     return templates.TemplateResponse("catalog.html", {"request": request})
 
 
-@app.get("/data/{sensor_id}", response_model=List[SensorDataModel])
+@router.get("/data/{sensor_id}", response_model=List[SensorDataModel])
 def read_data_by_sensor(sensor_id: int, skip: int = 0, limit: int = Query(default=100, le=1000),
                         db: Session = Depends(get_db)):
     """
@@ -200,13 +403,14 @@ def read_data_by_sensor(sensor_id: int, skip: int = 0, limit: int = Query(defaul
     - **limit**: Maximum number of records to return
     """
     try:
-        data = db.query(SensorData).filter(SensorData.sensor_id == sensor_id).offset(skip).limit(limit).all()
+        query = db.query(SensorData).filter(SensorData.sensor_id == sensor_id)
+        data = read_federated(query, skip, limit, sensor_ids=[sensor_id])
         return data
     except Exception as e:
         logger.error(f"Error retrieving data by sensor_id: {sensor_id}, error: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-@app.get("/data/summary/", response_model=List[SensorDataModel])
+@router.get("/data/summary/", response_model=List[SensorDataModel])
 def read_data_summary(
         type: Optional[str] = None,
         unit: Optional[str] = None,
@@ -237,13 +441,13 @@ def read_data_summary(
         query = query.filter(SensorData.timestamp <= end_time)
 
     try:
-        data = query.offset(skip).limit(limit).all()
+        data = read_federated(query, skip, limit, type=type, unit=unit, start_time=start_time, end_time=end_time)
         return data
     except Exception as e:
         logger.error(f"Error retrieving data summary: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-@app.get("/data/range/", response_model=List[SensorDataModel])
+@router.get("/data/range/", response_model=List[SensorDataModel])
 def read_data_by_timestamp(
         start_time: datetime,
         end_time: datetime,
@@ -259,14 +463,208 @@ def read_data_by_timestamp(
     - **limit**: Maximum number of records to return
     """
     try:
-        data = db.query(SensorData).filter(SensorData.timestamp >= start_time, SensorData.timestamp <= end_time).offset(skip).limit(limit).all()
+        query = db.query(SensorData).filter(SensorData.timestamp >= start_time, SensorData.timestamp <= end_time)
+        data = read_federated(query, skip, limit, start_time=start_time, end_time=end_time)
         return data
     except Exception as e:
         logger.error(f"Error retrieving data by timestamp range: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@app.get("/aggregated_data/{sensor_id}", response_model=List[AggregatedDataModel])
+@router.get("/data/near/", response_model=Union[List[SensorDataModel], List[SensorAggregateModel]])
+def read_data_near(
+        lat: float = Query(ge=-90, le=90),
+        lng: float = Query(ge=-180, le=180),
+        radius_km: float = Query(gt=0),
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        aggregate: bool = False,
+        skip: int = 0,
+        limit: int = Query(default=100, le=1000),
+        db: Session = Depends(get_db)
+):
+    """
+    Retrieve sensor data from sensors within a radius of a point.
+    - **lat**: Latitude of the point
+    - **lng**: Longitude of the point
+    - **radius_km**: Radius around the point in kilometers
+    - **start_time**: Start time for the data query
+    - **end_time**: End time for the data query
+    - **aggregate**: Return per-sensor aggregates instead of readings
+    - **skip**: Number of records to skip
+    - **limit**: Maximum number of records to return
+    """
+    try:
+        sensor_ids = sensor_grid.near(lat, lng, radius_km)
+        return read_spatial(db, sensor_ids, start_time, end_time, aggregate, skip, limit)
+    except Exception as e:
+        logger.error(f"Error retrieving data near ({lat}, {lng}): {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.get("/data/bbox/", response_model=Union[List[SensorDataModel], List[SensorAggregateModel]])
+def read_data_bbox(
+        min_lat: float = Query(ge=-90, le=90),
+        min_lng: float = Query(ge=-180, le=180),
+        max_lat: float = Query(ge=-90, le=90),
+        max_lng: float = Query(ge=-180, le=180),
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        aggregate: bool = False,
+        skip: int = 0,
+        limit: int = Query(default=100, le=1000),
+        db: Session = Depends(get_db)
+):
+    """
+    Retrieve sensor data from sensors inside a bounding box.
+    - **min_lat**, **min_lng**: South-west corner of the box
+    - **max_lat**, **max_lng**: North-east corner of the box
+    - **start_time**: Start time for the data query
+    - **end_time**: End time for the data query
+    - **aggregate**: Return per-sensor aggregates instead of readings
+    - **skip**: Number of records to skip
+    - **limit**: Maximum number of records to return
+    """
+    if min_lat > max_lat or min_lng > max_lng:
+        raise HTTPException(status_code=400, detail="Minimum coordinates must not exceed maximum coordinates")
+    try:
+        sensor_ids = sensor_grid.bbox(min_lat, min_lng, max_lat, max_lng)
+        return read_spatial(db, sensor_ids, start_time, end_time, aggregate, skip, limit)
+    except Exception as e:
+        logger.error(f"Error retrieving data in bounding box: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+def latest_per_sensor_query(db: Session, model, sensor_ids: List[int], type: Optional[str],
+                            unit: Optional[str], start_time: Optional[datetime], end_time: Optional[datetime],
+                            limit: int):
+    """
+    Build a single query returning the latest `limit` rows of every listed sensor.
+
+    Each sensor gets its own `ORDER BY timestamp DESC LIMIT n` branch, which reads at most `limit`
+    entries of the `(sensor_id, timestamp)` index instead of ranking the sensor's whole history.
+    """
+    queries = []
+    for sensor_id in sensor_ids:
+        query = db.query(
+            model.id, model.sensor_id, model.timestamp, model.value, model.lat, model.lng,
+            model.unit, model.type, model.description
+        ).filter(model.sensor_id == sensor_id)
+        if type:
+            query = query.filter(model.type == type)
+        if unit:
+            query = query.filter(model.unit == unit)
+        if start_time:
+            query = query.filter(model.timestamp >= start_time)
+        if end_time:
+            query = query.filter(model.timestamp <= end_time)
+        queries.append(query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit))
+    return queries[0].union_all(*queries[1:]) if len(queries) > 1 else queries[0]
+
+@router.get("/data/batch/")
+def read_data_batch(
+        sensor_id: Optional[List[int]] = Query(default=None),
+        type: Optional[str] = None,
+        unit: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        limit: int = Query(default=100, le=1000),
+        source: Literal["raw", "aggregated"] = "raw",
+        db: Session = Depends(get_db)
+):
+    """
+    Retrieve the latest readings of many sensors in a single round-trip, grouped by sensor in a columnar layout.
+    - **sensor_id**: IDs of the sensors, repeat the parameter for each sensor (optional, defaults to the
+      sensors in sensor_stats matching type and unit)
+    - **type**: Type of sensor data (e.g., temperature)
+    - **unit**: Unit of measurement
+    - **start_time**: Start time for the data query
+    - **end_time**: End time for the data query
+    - **limit**: Maximum number of records to return per sensor
+    - **source**: `raw` for sensor data, `aggregated` for aggregated sensor data
+    """
+    model = SensorData if source == "raw" else AggregatedData
+    try:
+        sensor_ids = sorted(set(sensor_id or []))
+        if not sensor_ids:
+            # Resolve type/unit selectors to sensor IDs, so every lookup is per sensor
+            query = db.query(SensorStats.sensor_id)
+            if type:
+                query = query.filter(SensorStats.type == type)
+            if unit:
+                query = query.filter(SensorStats.unit == unit)
+            sensor_ids = [row.sensor_id for row in query.order_by(SensorStats.sensor_id).all()]
+        if not sensor_ids:
+            return {"source": source, "sensors": {}}
+
+        rows = [
+            row._asdict()
+            for row in latest_per_sensor_query(db, model, sensor_ids, type, unit, start_time, end_time, limit).all()
+        ]
+        if source == "raw":
+            # Cold readings are older than any hot one, so they only fill sensors short of `limit`
+            counts = {}
+            for row in rows:
+                counts[row["sensor_id"]] = counts.get(row["sensor_id"], 0) + 1
+            short = [i for i in sensor_ids if counts.get(i, 0) < limit]
+            if short:
+                for row in reversed(cold_storage.latest_per_sensor(short, type, unit, start_time, end_time, limit)):
+                    if counts.get(row["sensor_id"], 0) < limit:
+                        counts[row["sensor_id"]] = counts.get(row["sensor_id"], 0) + 1
+                        rows.append(row)
+        rows.sort(key=lambda row: (row["sensor_id"], row["timestamp"]))
+
+        sensors = {}
+        for row in rows:
+            sensor = sensors.get(row["sensor_id"])
+            if sensor is None:
+                sensor = sensors[row["sensor_id"]] = {
+                    "lat": row["lat"], "lng": row["lng"], "unit": row["unit"], "type": row["type"],
+                    "description": row["description"], "id": [], "timestamp": [], "value": [],
+                }
+            sensor["id"].append(row["id"])
+            sensor["timestamp"].append(row["timestamp"])
+            sensor["value"].append(row["value"])
+        return {"source": source, "sensors": sensors}
+    except Exception as e:
+        logger.error(f"Error retrieving batch data: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/sensors/stats/", response_model=List[SensorStatsModel])
+def read_sensor_stats(
+        type: Optional[str] = None,
+        unit: Optional[str] = None,
+        db: Session = Depends(get_db)
+):
+    """
+    Retrieve per-sensor reading count, min/max/average value and first/last seen time.
+    - **type**: Type of sensor data (e.g., temperature)
+    - **unit**: Unit of measurement
+    """
+    query = db.query(SensorStats)
+
+    if type:
+        query = query.filter(SensorStats.type == type)
+    if unit:
+        query = query.filter(SensorStats.unit == unit)
+
+    try:
+        return [
+            SensorStatsModel(
+                sensor_id=stats.sensor_id, lat=stats.lat, lng=stats.lng, unit=stats.unit, type=stats.type,
+                description=stats.description, reading_count=stats.reading_count,
+                avg_value=stats.sum_value / stats.reading_count if stats.reading_count else None,
+                min_value=stats.min_value, max_value=stats.max_value,
+                first_seen=stats.first_seen, last_seen=stats.last_seen,
+            )
+            for stats in query.order_by(SensorStats.sensor_id).all()
+        ]
+    except Exception as e:
+        logger.error(f"Error retrieving sensor stats: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/aggregated_data/{sensor_id}", response_model=List[AggregatedDataModel])
 def read_data_by_sensor(sensor_id: int, skip: int = 0, limit: int = Query(default=100, le=1000),
                         db: Session = Depends(get_db)):
     """
@@ -282,7 +680,7 @@ def read_data_by_sensor(sensor_id: int, skip: int = 0, limit: int = Query(defaul
         logger.error(f"Error retrieving data by sensor_id: {sensor_id}, error: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-@app.get("/aggregated_data/summary/", response_model=List[AggregatedDataModel])
+@router.get("/aggregated_data/summary/", response_model=List[AggregatedDataModel])
 def read_data_summary(
         type: Optional[str] = None,
         unit: Optional[str] = None,
@@ -319,7 +717,7 @@ def read_data_summary(
         logger.error(f"Error retrieving data summary: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-@app.get("/aggregated_data/range/", response_model=List[AggregatedDataModel])
+@router.get("/aggregated_data/range/", response_model=List[AggregatedDataModel])
 def read_data_by_timestamp(
         start_time: datetime,
         end_time: datetime,
@@ -342,7 +740,7 @@ def read_data_by_timestamp(
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@app.post("/data/", response_model=SensorDataModel)
+@router.post("/data/", response_model=SensorDataModel)
 def create_sensor_data(sensor_data: SensorDataModel, db: Session = Depends(get_db)):
     """
     Create a new sensor data entry.
@@ -360,7 +758,7 @@ def create_sensor_data(sensor_data: SensorDataModel, db: Session = Depends(get_d
         logger.error(f"Error creating sensor data: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-@app.put("/data/{data_id}", response_model=SensorDataModel)
+@router.put("/data/{data_id}", response_model=SensorDataModel)
 def update_sensor_data(data_id: int, sensor_data: SensorDataModel, db: Session = Depends(get_db)):
     """
     Update an existing sensor data entry.
@@ -385,7 +783,7 @@ def update_sensor_data(data_id: int, sensor_data: SensorDataModel, db: Session =
         logger.error(f"Error updating sensor data with ID: {data_id}, error: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-@app.delete("/data/{data_id}", response_model=SensorDataModel)
+@router.delete("/data/{data_id}", response_model=SensorDataModel)
 def delete_sensor_data(data_id: int, db: Session = Depends(get_db)):
     """
     Delete an existing sensor data entry.
@@ -407,56 +805,87 @@ def delete_sensor_data(data_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-# Data quality check functions
-def check_completeness(df: pd.DataFrame) -> float:
-    total_entries = df.size
-    non_null_entries = df.count().sum()
-    completeness = (non_null_entries / total_entries) * 100
-    return completeness
-
-def check_validity(df: pd.DataFrame) -> float:
-    try:
-        pd.to_datetime(df['timestamp'])
-        return 100.0
-    except ValueError:
-        return 0.0
-
-def check_accuracy(df: pd.DataFrame) -> float:
-    return 100.0
-
-def check_consistency(df: pd.DataFrame) -> float:
-    consistent = df['timestamp'].apply(lambda x: isinstance(x, pd.Timestamp)).all()
-    return 100.0 if consistent else 0.0
-
-def check_timeliness(df: pd.DataFrame, update_frequency: str) -> float:
-    latest_entry = df['timestamp'].max()
-    now = pd.Timestamp.now()
-    if update_frequency == "daily":
-        return 100.0 if (now - latest_entry).days <= 1 else 0.0
-    return 0.0
-
-def check_uniqueness(df: pd.DataFrame) -> float:
-    total_rows = len(df)
-    unique_rows = len(df.drop_duplicates())
-    uniqueness = (unique_rows / total_rows) * 100
-    return uniqueness
+# Data quality scores computed from the precomputed ingest-time quality windows
+def quality_scores(totals) -> dict:
+    # SUM() comes back as Decimal from MySQL, so normalise the counters first
+    expected = int(totals.expected_count or 0)
+    received = int(totals.received_count or 0)
+    windows = int(totals.window_count or 0)
+    if windows == 0:
+        return {}
+
+    def score(failed, whole):
+        return round(100.0 - 100.0 * failed / whole, 2) if whole else 100.0
+
+    return {
+        "completeness": round(min(100.0 * received / expected, 100.0), 2) if expected else 100.0,
+        "validity": score(int(totals.clock_skew_count or 0), received),
+        "accuracy": score(int(totals.out_of_range_count or 0), received),
+        "consistency": score(int(totals.gap_windows or 0), windows),
+        "timeliness": score(int(totals.stale_windows or 0), windows),
+        "uniqueness": score(int(totals.duplicate_count or 0), received),
+        "expected_count": expected,
+        "received_count": received,
+        "missing_count": int(totals.missing_count or 0),
+        "gap_count": int(totals.gap_count or 0),
+        "out_of_range_count": int(totals.out_of_range_count or 0),
+        "duplicate_count": int(totals.duplicate_count or 0),
+        "clock_skew_count": int(totals.clock_skew_count or 0),
+        "max_clock_skew_ms": float(totals.max_clock_skew_ms or 0.0),
+        "windows": windows,
+    }
+
+def quality_totals_query(db: Session):
+    return db.query(
+        func.count(DataQualityWindow.id).label("window_count"),
+        func.sum(DataQualityWindow.expected_count).label("expected_count"),
+        func.sum(DataQualityWindow.received_count).label("received_count"),
+        func.sum(DataQualityWindow.missing_count).label("missing_count"),
+        func.sum(DataQualityWindow.gap_count).label("gap_count"),
+        func.sum(case((DataQualityWindow.gap_count > 0, 1), else_=0)).label("gap_windows"),
+        func.sum(case((DataQualityWindow.stale, 1), else_=0)).label("stale_windows"),
+        func.sum(DataQualityWindow.out_of_range_count).label("out_of_range_count"),
+        func.sum(DataQualityWindow.duplicate_count).label("duplicate_count"),
+        func.sum(DataQualityWindow.clock_skew_count).label("clock_skew_count"),
+        func.max(DataQualityWindow.max_clock_skew_ms).label("max_clock_skew_ms"),
+    )
 
 # Data quality check endpoint
-@app.get("/data/data-quality/")
-def data_quality_check(db: Session = Depends(get_db)):
+@router.get("/data/data-quality/")
+def data_quality_check(
+        sensor_id: Optional[int] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        db: Session = Depends(get_db)
+):
+    """
+    Report data quality of the sensor data from the quality windows computed by the ingester.
+    - **sensor_id**: Restrict the report to a single sensor
+    - **start_time**: Only include windows ending at or after this time, defaults to 24 hours before end_time
+    - **end_time**: Only include windows ending at or before this time
+    """
+    # Keep the lookup bounded when no range is given
+    if start_time is None:
+        start_time = (end_time or datetime.utcnow()) - timedelta(hours=24)
+
+    def apply_filters(query):
+        if sensor_id is not None:
+            query = query.filter(DataQualityWindow.sensor_id == sensor_id)
+        if start_time:
+            query = query.filter(DataQualityWindow.window_end >= start_time)
+        if end_time:
+            query = query.filter(DataQualityWindow.window_end <= end_time)
+        return query
+
     try:
-        sensor_data_df = get_dataframe_from_table(db, SensorData)
-        #aggregated_sensor_data_df = get_dataframe_from_table(db, AggregatedSensorData)
+        totals = apply_filters(quality_totals_query(db)).one()
+        per_sensor = apply_filters(
+            quality_totals_query(db).add_columns(DataQualityWindow.sensor_id)
+        ).group_by(DataQualityWindow.sensor_id).all()
 
         results = {
-            "sensor_data": {
-                "completeness": check_completeness(sensor_data_df),
-                "validity": check_validity(sensor_data_df),
-                "accuracy": check_accuracy(sensor_data_df),
-                "consistency": check_consistency(sensor_data_df),
-                "timeliness": check_timeliness(sensor_data_df, "daily"),
-                "uniqueness": check_uniqueness(sensor_data_df),
-            }
+            "sensor_data": quality_scores(totals),
+            "sensors": {row.sensor_id: quality_scores(row) for row in per_sensor},
         }
 
         return {"status": "Check completed", "results": results}
@@ -464,12 +893,35 @@ def data_quality_check(db: Session = Depends(get_db)):
         logger.error(f"Error performing data quality checks: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-from sqlalchemy import text
-
-def get_dataframe_from_table(db: Session, table):
-    query = text(f"SELECT * FROM {table.__tablename__}")
-    df = pd.read_sql(query, db.bind)
-    return df
+@router.get("/data/data-quality/windows/", response_model=List[DataQualityWindowModel])
+def read_data_quality_windows(
+        sensor_id: Optional[int] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        skip: int = 0,
+        limit: int = Query(default=100, le=1000),
+        db: Session = Depends(get_db)
+):
+    """
+    Retrieve the raw quality windows computed by the ingester, most recent first.
+    - **sensor_id**: ID of the sensor
+    - **start_time**: Only include windows ending at or after this time
+    - **end_time**: Only include windows ending at or before this time
+    - **skip**: Number of records to skip
+    - **limit**: Maximum number of records to return
+    """
+    query = db.query(DataQualityWindow)
 
+    if sensor_id is not None:
+        query = query.filter(DataQualityWindow.sensor_id == sensor_id)
+    if start_time:
+        query = query.filter(DataQualityWindow.window_end >= start_time)
+    if end_time:
+        query = query.filter(DataQualityWindow.window_end <= end_time)
 
-app.include_router(router)
\ No newline at end of file
+    try:
+        data = query.order_by(DataQualityWindow.window_end.desc()).offset(skip).limit(limit).all()
+        return data
+    except Exception as e:
+        logger.error(f"Error retrieving data quality windows: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
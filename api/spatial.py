@@ -0,0 +1,101 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Great-circle distance between two points in kilometers.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SensorGrid:
+    """
+    In-memory uniform grid over sensor locations.
+
+    Sensors are bucketed into cells of `cell_size` degrees so that radius and
+    bounding-box lookups only visit the cells overlapping the query area.
+    The locations are reloaded through `loader` once they are older than `ttl_s`.
+    """
+    def __init__(self, loader: Callable[[], Iterable[Tuple[int, float, float]]], cell_size: float = 1.0,
+                 ttl_s: float = 300):
+        self.loader = loader
+        self.cell_size = cell_size
+        self.ttl_s = ttl_s
+        self.lock = threading.Lock()
+        self.cells: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = {}
+        self.locations: Dict[int, Tuple[float, float]] = {}
+        self.loaded_at = None
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_size), math.floor(lng / self.cell_size)
+
+    def refresh(self):
+        """
+        Rebuild the grid from the current sensor locations.
+        """
+        cells = defaultdict(list)
+        locations = {}
+        for sensor_id, lat, lng in self.loader():
+            cells[self._cell(lat, lng)].append((sensor_id, lat, lng))
+            locations[sensor_id] = (lat, lng)
+        with self.lock:
+            self.cells = dict(cells)
+            self.locations = locations
+            self.loaded_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl_s:
+            self.refresh()
+
+    def _candidates(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float):
+        self._ensure_fresh()
+        min_cell, max_cell = self._cell(min_lat, min_lng), self._cell(max_lat, max_lng)
+        with self.lock:
+            for i in range(min_cell[0], max_cell[0] + 1):
+                for j in range(min_cell[1], max_cell[1] + 1):
+                    yield from self.cells.get((i, j), ())
+
+    def bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[int]:
+        """
+        Return the IDs of the sensors inside a bounding box.
+        """
+        return sorted(
+            sensor_id for sensor_id, lat, lng in self._candidates(min_lat, min_lng, max_lat, max_lng)
+            if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+        )
+
+    def near(self, lat: float, lng: float, radius_km: float) -> List[int]:
+        """
+        Return the IDs of the sensors within `radius_km` of a point.
+        """
+        d_lat = radius_km / KM_PER_DEGREE
+        min_lat, max_lat = max(-90.0, lat - d_lat), min(90.0, lat + d_lat)
+        cos_lat = math.cos(math.radians(lat))
+        # Near or across the poles a radius can span every longitude
+        if cos_lat < 1e-6 or min_lat == -90.0 or max_lat == 90.0:
+            d_lng = 180.0
+        else:
+            d_lng = min(180.0, radius_km / (KM_PER_DEGREE * cos_lat))
+        lng_ranges = [(max(-180.0, lng - d_lng), min(180.0, lng + d_lng))]
+        # A window crossing the antimeridian continues on the other side
+        if lng - d_lng < -180.0:
+            lng_ranges.append((lng - d_lng + 360.0, 180.0))
+        if lng + d_lng > 180.0:
+            lng_ranges.append((-180.0, lng + d_lng - 360.0))
+        return sorted({
+            sensor_id
+            for min_lng, max_lng in lng_ranges
+            for sensor_id, s_lat, s_lng in self._candidates(min_lat, min_lng, max_lat, max_lng)
+            if haversine_km(lat, lng, s_lat, s_lng) <= radius_km
+        })
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from database import Database
+
+database = None
+
+
+def init_worker():
+    """
+    Open one Database per worker process.
+    """
+    global database
+    database = Database()
+
+
+def process_chunk(start, end, sensor_ids, recompute):
+    """
+    Recompute the aggregates of one time/sensor chunk inside a worker process.
+
+    Returns:
+        int: Number of aggregates written, or None if the chunk failed.
+    """
+    return database.rollup(start, end, sensor_ids, recompute)
+
+
+def build_chunks(start, end, sensor_ids, chunk_hours, sensors_per_chunk, mode):
+    """
+    Split the backfill range into time/sensor chunks.
+
+    Returns:
+        list: Tuples of (key, start, end, sensor_ids), where key identifies the chunk in the progress file.
+    """
+    sensor_groups = [
+        sensor_ids[i:i + sensors_per_chunk] for i in range(0, len(sensor_ids), sensors_per_chunk)
+    ]
+    chunks = []
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + timedelta(hours=chunk_hours), end)
+        for group in sensor_groups:
+            key = f"{mode}/{chunk_start.isoformat()}/{chunk_end.isoformat()}/{','.join(map(str, group))}"
+            chunks.append((key, chunk_start, chunk_end, group))
+        chunk_start = chunk_end
+    return chunks
+
+
+def load_progress(path):
+    """
+    Read the keys of the finished chunks from the progress log.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path) as progress_file:
+        # Skip a last line cut short by an interrupt, see open_progress
+        return {line.rstrip("\n") for line in progress_file if line.endswith("\n")}
+
+
+def open_progress(path):
+    """
+    Open the progress log for appending, dropping a line cut short by an interrupt.
+    """
+    progress_file = open(path, "a+")
+    progress_file.seek(0)
+    content = progress_file.read()
+    if content and not content.endswith("\n"):
+        # A truncated key can look like another chunk's key, e.g. ".../12" cut to ".../1"
+        progress_file.truncate(content.rfind("\n") + 1)
+    return progress_file
+
+
+def record_progress(progress_file, key):
+    """
+    Append a finished chunk to the progress log, one key per line.
+    """
+    progress_file.write(key + "\n")
+    progress_file.flush()
+
+
+def minute(value):
+    return datetime.fromisoformat(value).replace(second=0, microsecond=0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute aggregated sensor data from raw sensor data.")
+    parser.add_argument("--start", type=minute, required=True, help="Start of the range, e.g. 2024-06-01T00:00")
+    parser.add_argument("--end", type=minute, required=True, help="End of the range (exclusive)")
+    parser.add_argument("--sensors", type=lambda s: [int(i) for i in s.split(",")],
+                        help="Comma-separated sensor IDs, defaults to all sensors in sensors.json")
+    parser.add_argument("--recompute", action="store_true",
+                        help="Replace existing aggregates instead of only filling missing minutes")
+    parser.add_argument("--chunk-hours", type=int, default=24, help="Hours of raw data per chunk")
+    parser.add_argument("--sensors-per-chunk", type=int, default=1, help="Sensors per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--progress-file", default="backfill_progress.log",
+                        help="File recording finished chunks, so an interrupted backfill can be resumed")
+    args = parser.parse_args()
+
+    sensor_ids = args.sensors
+    if sensor_ids is None:
+        with open("sensors.json") as sensors_json:
+            sensor_ids = sorted(int(k) for k in json.load(sensors_json))
+
+    mode = "recompute" if args.recompute else "fill"
+    chunks = build_chunks(args.start, args.end, sensor_ids, args.chunk_hours, args.sensors_per_chunk, mode)
+    done = load_progress(args.progress_file)
+    pending = [chunk for chunk in chunks if chunk[0] not in done]
+    print(f"{len(chunks) - len(pending)} of {len(chunks)} chunks already done, {len(pending)} to go")
+
+    completed, failed = len(chunks) - len(pending), 0
+    with open_progress(args.progress_file) as progress_file, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as executor:
+        futures = {
+            executor.submit(process_chunk, start, end, group, args.recompute): key
+            for key, start, end, group in pending
+        }
+        try:
+            for future in as_completed(futures):
+                key = futures[future]
+                written = future.result()
+                if written is None:
+                    failed += 1
+                    print(f"Chunk {key} failed, it will be retried on the next run")
+                    continue
+                record_progress(progress_file, key)
+                completed += 1
+                print(f"Chunk {key} done ({written} rows), {completed} of {len(chunks)}")
+        except KeyboardInterrupt:
+            print("Interrupted, finished chunks are saved in the progress file")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    print(f"Backfill finished with {failed} failed chunks")
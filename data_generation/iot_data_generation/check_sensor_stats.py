@@ -0,0 +1,16 @@
+import argparse
+from database import Database
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile the sensor_stats table against sensor_data.")
+    parser.add_argument("--fix", action="store_true", help="Rewrite mismatching sensors from sensor_data")
+    args = parser.parse_args()
+
+    database = Database()
+    mismatches = database.check_sensor_stats(fix=args.fix)
+    for sensor_id, field, stored, actual in mismatches:
+        print(f"sensor {sensor_id}: {field} is {stored} in sensor_stats, {actual} in sensor_data")
+    if not mismatches:
+        print("sensor_stats is consistent with sensor_data")
+    elif args.fix:
+        print(f"Fixed {len({mismatch[0] for mismatch in mismatches})} sensors")
@@ -2,8 +2,13 @@ import mysql.connector
 from mysql.connector import Error
 import os
 import threading
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from partitions import (
+    MAX_PARTITION, period_start, next_period, parse_partition_name,
+    partition_clause, partition_definitions
+)
+from settings import get_settings
 
 load_dotenv()
 
@@ -16,8 +21,11 @@ class Database:
         Initialize the database connection and create the tables if they don't exist.
         """
         self.lock = threading.Lock()
+        self.settings = get_settings()
         self.create_sensor_data_table()
         self.create_aggregated_data_table()
+        self.create_quality_table()
+        self.create_sensor_stats_table()
 
     def create_connection(self):
         """
@@ -38,6 +46,33 @@ class Database:
             print(e)
         return conn
 
+    def initial_partition_clause(self, granularity):
+        """
+        Build the PARTITION BY clause for a new table, covering the current period and the pre-created ones.
+
+        Args:
+            granularity (str): Either "day" or "month".
+
+        Returns:
+            str: The PARTITION BY clause.
+        """
+        return partition_clause(datetime.utcnow().date(), self.last_precreated_period(granularity), granularity)
+
+    def last_precreated_period(self, granularity):
+        """
+        Return the start of the furthest future partition period that should exist.
+
+        Args:
+            granularity (str): Either "day" or "month".
+
+        Returns:
+            date: First day of that period.
+        """
+        last = period_start(datetime.utcnow().date(), granularity)
+        for _ in range(self.settings.partition_precreate):
+            last = next_period(last, granularity)
+        return last
+
     def create_sensor_data_table(self):
         """
         Create the sensor_data table if it doesn't exist.
@@ -48,17 +83,20 @@ class Database:
                 cursor = conn.cursor()
                 cursor.execute("""
                 CREATE TABLE IF NOT EXISTS sensor_data (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    id INT AUTO_INCREMENT,
                     sensor_id INT,
-                    timestamp DATETIME,
+                    timestamp DATETIME NOT NULL,
                     value FLOAT,
                     lat FLOAT,
                     lng FLOAT,
                     unit VARCHAR(255),
                     type VARCHAR(255),
-                    description TEXT
+                    description TEXT,
+                    PRIMARY KEY (id, timestamp),
+                    INDEX idx_sensor_data_sensor_timestamp (sensor_id, timestamp),
+                    INDEX idx_sensor_data_timestamp (timestamp)
                 )
-                """)
+                """ + self.initial_partition_clause(self.settings.raw_partition_granularity))
                 conn.commit()
             finally:
                 conn.close()
@@ -75,15 +113,96 @@ class Database:
                 cursor = conn.cursor()
                 cursor.execute("""
                 CREATE TABLE IF NOT EXISTS aggregated_sensor_data (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    id INT AUTO_INCREMENT,
                     sensor_id INT,
-                    timestamp DATETIME,
+                    timestamp DATETIME NOT NULL,
                     value FLOAT,
                     lat FLOAT,
                     lng FLOAT,
                     unit VARCHAR(255),
                     type VARCHAR(255),
-                    description TEXT
+                    description TEXT,
+                    PRIMARY KEY (id, timestamp),
+                    UNIQUE INDEX idx_aggregated_sensor_data_sensor_timestamp (sensor_id, timestamp)
+                )
+                """ + self.initial_partition_clause(self.settings.aggregated_partition_granularity))
+                conn.commit()
+            finally:
+                conn.close()
+        else:
+            print("Error! cannot create the database connection.")
+
+    def create_quality_table(self):
+        """
+        Create the sensor_data_quality table if it doesn't exist.
+        """
+        conn = self.create_connection()
+        if conn is not None:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sensor_data_quality (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    sensor_id INT,
+                    window_start DATETIME,
+                    window_end DATETIME,
+                    expected_count INT,
+                    received_count INT,
+                    missing_count INT,
+                    gap_count INT,
+                    max_gap_ms FLOAT,
+                    stale BOOLEAN,
+                    out_of_range_count INT,
+                    duplicate_count INT,
+                    clock_skew_count INT,
+                    max_clock_skew_ms FLOAT,
+                    INDEX idx_quality_window (window_end, sensor_id)
+                )
+                """)
+                conn.commit()
+            finally:
+                conn.close()
+        else:
+            print("Error! cannot create the database connection.")
+
+    def create_sensor_stats_table(self):
+        """
+        Create the sensor_stats table if it doesn't exist.
+        """
+        conn = self.create_connection()
+        if conn is not None:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sensor_stats (
+                    sensor_id INT PRIMARY KEY,
+                    lat FLOAT,
+                    lng FLOAT,
+                    unit VARCHAR(255),
+                    type VARCHAR(255),
+                    description TEXT,
+                    reading_count BIGINT NOT NULL,
+                    sum_value DOUBLE NOT NULL,
+                    min_value FLOAT,
+                    max_value FLOAT,
+                    first_seen DATETIME,
+                    last_seen DATETIME,
+                    INDEX idx_sensor_stats_type_unit (type, unit)
+                )
+                """)
+                # Statistics of readings removed from sensor_data by partition drops or cold-storage
+                # compaction, one row per removal and sensor, so sensor_stats can keep lifetime totals
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sensor_stats_archive (
+                    source VARCHAR(255) NOT NULL,
+                    sensor_id INT NOT NULL,
+                    reading_count BIGINT NOT NULL,
+                    sum_value DOUBLE NOT NULL,
+                    min_value FLOAT,
+                    max_value FLOAT,
+                    first_seen DATETIME,
+                    last_seen DATETIME,
+                    PRIMARY KEY (source, sensor_id)
                 )
                 """)
                 conn.commit()
@@ -138,7 +257,9 @@ class Database:
                 cursor = conn.cursor()
                 query = """
                 INSERT INTO aggregated_sensor_data (sensor_id, timestamp, value, lat, lng, unit, type, description)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s) AS new
+                ON DUPLICATE KEY UPDATE value = new.value, lat = new.lat, lng = new.lng,
+                    unit = new.unit, type = new.type, description = new.description
                 """
                 data_values = (
                     int(sensor_id), datetime.now(), avg_value,
@@ -154,3 +275,407 @@ class Database:
                 conn.close()
         else:
             print("Error! cannot create the database connection.")
+
+    def update_sensor_stats(self, rows):
+        """
+        Merge the statistics of one aggregation window into the sensor_stats table.
+
+        Args:
+            rows (list): Tuples of (sensor_id, lat, lng, unit, type, description, reading_count,
+                         sum_value, min_value, max_value, first_seen, last_seen).
+        """
+        conn = self.create_connection()
+        if conn is not None:
+            try:
+                cursor = conn.cursor()
+                query = """
+                INSERT INTO sensor_stats (sensor_id, lat, lng, unit, type, description, reading_count,
+                    sum_value, min_value, max_value, first_seen, last_seen)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) AS new
+                ON DUPLICATE KEY UPDATE
+                    lat = new.lat,
+                    lng = new.lng,
+                    unit = new.unit,
+                    type = new.type,
+                    description = new.description,
+                    reading_count = sensor_stats.reading_count + new.reading_count,
+                    sum_value = sensor_stats.sum_value + new.sum_value,
+                    min_value = LEAST(sensor_stats.min_value, new.min_value),
+                    max_value = GREATEST(sensor_stats.max_value, new.max_value),
+                    first_seen = LEAST(sensor_stats.first_seen, new.first_seen),
+                    last_seen = GREATEST(sensor_stats.last_seen, new.last_seen)
+                """
+                cursor.executemany(query, rows)
+                conn.commit()
+            except Error as e:
+                print(f"Error updating sensor stats: {e}")
+            finally:
+                conn.close()
+        else:
+            print("Error! cannot create the database connection.")
+
+    def check_sensor_stats(self, fix=False):
+        """
+        Reconcile the sensor_stats table against sensor_data and sensor_stats_archive.
+
+        Only readings up to each sensor's last_seen are recomputed, so readings the ingester
+        hasn't flushed into sensor_stats yet are neither reported nor counted twice after a fix.
+        Readings that were removed by partition drops or compaction are taken from the archive.
+
+        Args:
+            fix (bool): Replace the statistics of mismatching sensors with the recomputed ones.
+
+        Returns:
+            list: Tuples of (sensor_id, field, stored value, recomputed value) for every mismatch.
+        """
+        fields = ["reading_count", "min_value", "max_value", "first_seen", "last_seen"]
+        conn = self.create_connection()
+        if conn is None:
+            print("Error! cannot create the database connection.")
+            return []
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM sensor_stats")
+            stored = {row["sensor_id"]: row for row in cursor.fetchall()}
+            cursor.execute("""
+            SELECT d.sensor_id, COUNT(*) AS reading_count, SUM(d.value) AS sum_value,
+                   MIN(d.value) AS min_value, MAX(d.value) AS max_value,
+                   MIN(d.timestamp) AS first_seen, MAX(d.timestamp) AS last_seen
+            FROM sensor_data d
+            JOIN sensor_stats s ON s.sensor_id = d.sensor_id
+            WHERE d.timestamp <= s.last_seen
+            GROUP BY d.sensor_id
+            """)
+            hot = cursor.fetchall()
+            cursor.execute("""
+            SELECT sensor_id, SUM(reading_count) AS reading_count, SUM(sum_value) AS sum_value,
+                   MIN(min_value) AS min_value, MAX(max_value) AS max_value,
+                   MIN(first_seen) AS first_seen, MAX(last_seen) AS last_seen
+            FROM sensor_stats_archive
+            GROUP BY sensor_id
+            """)
+            archived = cursor.fetchall()
+
+            # Merge the hot and archived statistics per sensor
+            actual = {}
+            for row in hot + archived:
+                row = dict(row, reading_count=int(row["reading_count"]), sum_value=float(row["sum_value"]))
+                current = actual.get(row["sensor_id"])
+                if current is None:
+                    actual[row["sensor_id"]] = row
+                    continue
+                current["reading_count"] += row["reading_count"]
+                current["sum_value"] += row["sum_value"]
+                current["min_value"] = min(current["min_value"], row["min_value"])
+                current["max_value"] = max(current["max_value"], row["max_value"])
+                current["first_seen"] = min(current["first_seen"], row["first_seen"])
+                current["last_seen"] = max(current["last_seen"], row["last_seen"])
+
+            mismatches = []
+            for sensor_id in sorted(set(actual) | set(stored)):
+                expected, current = actual.get(sensor_id), stored.get(sensor_id)
+                for field in fields:
+                    expected_value = expected[field] if expected else None
+                    current_value = current[field] if current else None
+                    if isinstance(expected_value, float) or isinstance(current_value, float):
+                        equal = expected_value is not None and current_value is not None \
+                            and abs(expected_value - current_value) < 1e-3
+                    else:
+                        equal = expected_value == current_value
+                    if not equal:
+                        mismatches.append((sensor_id, field, current_value, expected_value))
+
+            if fix:
+                for sensor_id in sorted({mismatch[0] for mismatch in mismatches}):
+                    row = actual.get(sensor_id)
+                    if row is None:
+                        cursor.execute("DELETE FROM sensor_stats WHERE sensor_id = %s", (sensor_id,))
+                        continue
+                    cursor.execute("""
+                    UPDATE sensor_stats
+                    SET reading_count = %s, sum_value = %s, min_value = %s, max_value = %s,
+                        first_seen = %s, last_seen = %s
+                    WHERE sensor_id = %s
+                    """, (
+                        row["reading_count"], row["sum_value"], row["min_value"], row["max_value"],
+                        row["first_seen"], row["last_seen"], sensor_id
+                    ))
+                conn.commit()
+            return mismatches
+        finally:
+            conn.close()
+
+    def insert_quality_windows(self, rows):
+        """
+        Insert per-sensor quality windows into the sensor_data_quality table.
+
+        Args:
+            rows (list): Tuples as returned by QualityMonitor.flush.
+        """
+        conn = self.create_connection()
+        if conn is not None:
+            try:
+                cursor = conn.cursor()
+                query = """
+                INSERT INTO sensor_data_quality (sensor_id, window_start, window_end, expected_count, received_count,
+                    missing_count, gap_count, max_gap_ms, stale, out_of_range_count, duplicate_count,
+                    clock_skew_count, max_clock_skew_ms)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """
+                cursor.executemany(query, rows)
+                conn.commit()
+            except Error as e:
+                print(f"Error inserting quality windows: {e}")
+            finally:
+                conn.close()
+        else:
+            print("Error! cannot create the database connection.")
+
+    def list_partitions(self, table):
+        """
+        List the range partitions of a table.
+
+        Args:
+            table (str): The table name.
+
+        Returns:
+            list: Partition names ordered by position, or an empty list if the table isn't partitioned.
+        """
+        conn = self.create_connection()
+        if conn is None:
+            print("Error! cannot create the database connection.")
+            return []
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+            SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+            """, (table,))
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def migrate_to_partitions(self, table, granularity):
+        """
+        Convert an existing, unpartitioned table to daily or monthly range partitions on timestamp.
+
+        This rebuilds the table, so it is meant to be run once from migrate_partitions.py
+        rather than on every start.
+
+        Args:
+            table (str): The table name.
+            granularity (str): Either "day" or "month".
+        """
+        if self.list_partitions(table):
+            print(f"{table} is already partitioned")
+            return
+        conn = self.create_connection()
+        if conn is None:
+            print("Error! cannot create the database connection.")
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT MIN(timestamp) FROM {table}")
+            oldest = cursor.fetchone()[0]
+            today = datetime.utcnow().date()
+            last = self.last_precreated_period(granularity)
+            # Aggregates are upserted on (sensor_id, timestamp), see rollup
+            index = "UNIQUE INDEX" if table == "aggregated_sensor_data" else "INDEX"
+            # Replay pages raw readings in (timestamp, id) order, see replay.read_database
+            timestamp_index = ",\n                ADD INDEX idx_sensor_data_timestamp (timestamp)" if table == "sensor_data" else ""
+            # The partitioning column has to be part of every unique key
+            cursor.execute(f"""
+            ALTER TABLE {table}
+                MODIFY timestamp DATETIME NOT NULL,
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (id, timestamp),
+                ADD {index} idx_{table}_sensor_timestamp (sensor_id, timestamp){timestamp_index}
+            """)
+            cursor.execute(f"ALTER TABLE {table} " + partition_clause(oldest.date() if oldest else today, last, granularity))
+            conn.commit()
+            print(f"Partitioned {table} by {granularity}")
+        except Error as e:
+            print(f"Error partitioning {table}: {e}")
+        finally:
+            conn.close()
+
+    def rollup(self, start, end, sensor_ids=None, recompute=False):
+        """
+        Aggregate raw data between start and end into one row per sensor and minute.
+
+        By default only minutes the ingester did not aggregate (e.g. because it was down) are
+        rolled up, so dropping a raw partition afterwards doesn't lose that period. With
+        `recompute`, the existing aggregates of the period are replaced. Rolled-up rows are
+        stamped with the end of their minute and upserted, so running this twice is harmless.
+
+        Args:
+            start (datetime): Start of the period (inclusive), aligned to a minute.
+            end (datetime): End of the period (exclusive), aligned to a minute.
+            sensor_ids (list): Restrict the rollup to these sensors, defaults to all.
+            recompute (bool): Replace existing aggregates instead of only filling missing minutes.
+
+        Returns:
+            int: Number of aggregates written, or None if the rollup failed.
+        """
+        sensor_filter, params = "", [start, end]
+        if sensor_ids:
+            sensor_filter = f"AND sensor_id IN ({', '.join(['%s'] * len(sensor_ids))})"
+            params += [int(sensor_id) for sensor_id in sensor_ids]
+        # Checked once per grouped (sensor, minute), not once per raw reading
+        missing_only = "" if recompute else """
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM aggregated_sensor_data a
+                    WHERE a.sensor_id = g.sensor_id
+                      AND a.timestamp >= g.bucket AND a.timestamp < g.bucket + INTERVAL 2 MINUTE
+                )"""
+
+        conn = self.create_connection()
+        if conn is None:
+            print("Error! cannot create the database connection.")
+            return None
+        try:
+            cursor = conn.cursor()
+            if recompute:
+                cursor.execute(f"""
+                DELETE FROM aggregated_sensor_data
+                WHERE timestamp > %s AND timestamp <= %s {sensor_filter}
+                """, params)
+            cursor.execute(f"""
+            INSERT INTO aggregated_sensor_data (sensor_id, timestamp, value, lat, lng, unit, type, description)
+            SELECT * FROM (
+                SELECT g.sensor_id AS sensor_id, g.bucket + INTERVAL 1 MINUTE AS timestamp, g.value AS value,
+                       g.lat AS lat, g.lng AS lng, g.unit AS unit, g.type AS type, g.description AS description
+                FROM (
+                    SELECT sensor_id, timestamp - INTERVAL SECOND(timestamp) SECOND AS bucket,
+                           AVG(value) AS value, MAX(lat) AS lat, MAX(lng) AS lng,
+                           MAX(unit) AS unit, MAX(type) AS type, MAX(description) AS description
+                    FROM sensor_data
+                    WHERE timestamp >= %s AND timestamp < %s {sensor_filter}
+                    GROUP BY sensor_id, bucket
+                ) g{missing_only}
+            ) AS rolled
+            ON DUPLICATE KEY UPDATE value = rolled.value
+            """, params)
+            conn.commit()
+            # An upsert that changes an existing row counts twice
+            return cursor.rowcount
+        except Error as e:
+            conn.rollback()
+            print(f"Error rolling up data between {start} and {end}: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def expire_quality_windows(self, retention_days, batch_size=10000):
+        """
+        Delete quality windows past the retention period.
+
+        The table holds one small row per sensor and minute, so it isn't partitioned; the
+        delete walks the window_end index in batches to keep each statement short.
+
+        Args:
+            retention_days (int): Number of days to keep.
+            batch_size (int): Maximum number of rows deleted per statement.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        conn = self.create_connection()
+        if conn is None:
+            print("Error! cannot create the database connection.")
+            return
+        try:
+            cursor = conn.cursor()
+            deleted = 0
+            while True:
+                cursor.execute(
+                    "DELETE FROM sensor_data_quality WHERE window_end < %s ORDER BY window_end LIMIT %s",
+                    (cutoff, batch_size)
+                )
+                conn.commit()
+                deleted += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+            if deleted:
+                print(f"Deleted {deleted} expired quality windows")
+        except Error as e:
+            print(f"Error deleting expired quality windows: {e}")
+        finally:
+            conn.close()
+
+    def maintain_partitions(self, table, granularity, retention_days, rollup=False, archive_stats=False):
+        """
+        Pre-create future partitions and drop the ones past the retention period.
+
+        Args:
+            table (str): The table name.
+            granularity (str): Either "day" or "month".
+            retention_days (int): Number of days to keep.
+            rollup (bool): Make sure aggregates exist for a partition before it is dropped.
+            archive_stats (bool): Record the per-sensor statistics of a partition in
+                sensor_stats_archive before it is dropped.
+        """
+        partitions = self.list_partitions(table)
+        if not partitions:
+            print(f"{table} is not partitioned, run migrate_partitions.py first")
+            return
+        starts = {name: parse_partition_name(name, granularity) for name in partitions if name != MAX_PARTITION}
+
+        newest = max(starts.values())
+        new_definitions = partition_definitions(
+            next_period(newest, granularity), self.last_precreated_period(granularity), granularity
+        )
+
+        cutoff = datetime.utcnow().date() - timedelta(days=retention_days)
+        expired = [name for name, start in starts.items() if next_period(start, granularity) <= cutoff]
+
+        conn = self.create_connection()
+        if conn is None:
+            print("Error! cannot create the database connection.")
+            return
+        try:
+            cursor = conn.cursor()
+            if new_definitions:
+                # pmax is empty as long as partitions are created ahead of time, so this is cheap
+                cursor.execute(
+                    f"ALTER TABLE {table} REORGANIZE PARTITION {MAX_PARTITION} INTO (" +
+                    ", ".join(new_definitions + [f"PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE"]) + ")"
+                )
+                print(f"Created {len(new_definitions)} partitions on {table}")
+            for name in expired:
+                start = starts[name]
+                end = next_period(start, granularity)
+                if rollup:
+                    rolled_up = self.rollup(datetime.combine(start, datetime.min.time()),
+                                            datetime.combine(end, datetime.min.time()))
+                    if rolled_up is None:
+                        print(f"Keeping partition {name} of {table} until its aggregates exist")
+                        continue
+                    if rolled_up:
+                        print(f"Rolled up {rolled_up} missing aggregates from partition {name} of {table}")
+                if archive_stats:
+                    # Keyed by partition, so a retry after a failed drop overwrites instead of adding up
+                    cursor.execute(f"""
+                    INSERT INTO sensor_stats_archive (source, sensor_id, reading_count, sum_value,
+                        min_value, max_value, first_seen, last_seen)
+                    SELECT * FROM (
+                        SELECT %s AS source, sensor_id, COUNT(*) AS reading_count, SUM(value) AS sum_value,
+                               MIN(value) AS min_value, MAX(value) AS max_value,
+                               MIN(timestamp) AS first_seen, MAX(timestamp) AS last_seen
+                        FROM {table} PARTITION ({name})
+                        GROUP BY sensor_id
+                    ) AS removed
+                    ON DUPLICATE KEY UPDATE
+                        reading_count = removed.reading_count,
+                        sum_value = removed.sum_value,
+                        min_value = removed.min_value,
+                        max_value = removed.max_value,
+                        first_seen = removed.first_seen,
+                        last_seen = removed.last_seen
+                    """, (f"{table}:{name}",))
+                    conn.commit()
+                cursor.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+                print(f"Dropped expired partition {name} of {table}")
+        except Error as e:
+            print(f"Error maintaining partitions of {table}: {e}")
+        finally:
+            conn.close()
@@ -1,7 +1,10 @@
 import json
+import time
 import asyncio
+import datetime
 import logging
 import paho.mqtt.client as mqtt
+from replay import read_export, read_database, next_batch, parse_timestamp, to_payload
 from sensor import Sensor
 from settings import get_settings
 
@@ -27,3 +30,59 @@ class Generator:
         ]
 
         await asyncio.gather(*tasks)
+
+    async def replay(self):
+        """
+        Publish historical readings in timestamp order, keeping their original inter-arrival times.
+
+        Readings come from the export file in REPLAY_SOURCE, or from sensor_data if it is
+        set to "mysql". REPLAY_SPEED scales the pace (2 replays twice as fast) and 0 publishes
+        as fast as possible. Readings are published with the current time as timestamp.
+        """
+        logging.basicConfig(level=self.settings.logging_level)
+
+        self.mqtt_client.connect(self.settings.mqtt.host, self.settings.mqtt.port)
+        # Replay keeps the original gaps, so the network loop has to send keepalives and reconnect
+        self.mqtt_client.loop_start()
+
+        if self.settings.replay_source == "mysql":
+            readings = read_database(self.settings.replay_start, self.settings.replay_end)
+        else:
+            readings = read_export(self.settings.replay_source)
+
+        speed = self.settings.replay_speed
+        first_timestamp, started_at, published, failed, result = None, time.monotonic(), 0, 0, None
+        try:
+            # Fetch readings in a worker thread so file and database reads don't block the event loop
+            while batch := await asyncio.to_thread(next_batch, readings):
+                for reading in batch:
+                    timestamp = parse_timestamp(reading["timestamp"])
+                    if first_timestamp is None:
+                        first_timestamp = timestamp
+                    if speed > 0:
+                        # Schedule against the start of the replay so sleeps don't accumulate drift
+                        due = started_at + (timestamp - first_timestamp).total_seconds() / speed
+                        await asyncio.sleep(max(0.0, due - time.monotonic()))
+                    elif (published + failed) % 1000 == 0:
+                        # Let the aggregation task run now and then at max speed
+                        await asyncio.sleep(0)
+
+                    payload = json.dumps(to_payload(reading, datetime.datetime.utcnow()), default=str)
+                    logging.debug(f"{self.settings.mqtt.topic}: {payload}")
+                    result = self.mqtt_client.publish(self.settings.mqtt.topic, payload)
+                    if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                        published += 1
+                    else:
+                        failed += 1
+                        logging.warning(f"Failed to publish reading: {mqtt.error_string(result.rc)}")
+
+            # Let the network loop send what is still queued before stopping it
+            if result is not None and result.rc == mqtt.MQTT_ERR_SUCCESS:
+                await asyncio.to_thread(result.wait_for_publish, 10)
+        finally:
+            self.mqtt_client.loop_stop()
+
+        logging.info(
+            f"Replay finished after {published} readings in {time.monotonic() - started_at:.1f}s, "
+            f"{failed} failed to publish"
+        )
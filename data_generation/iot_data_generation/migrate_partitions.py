@@ -0,0 +1,10 @@
+from database import Database
+from settings import get_settings
+
+if __name__ == "__main__":
+    # One-off migration of existing deployments to range-partitioned tables.
+    # New deployments get partitioned tables from Database.create_*_table directly.
+    settings = get_settings()
+    database = Database()
+    database.migrate_to_partitions("sensor_data", settings.raw_partition_granularity)
+    database.migrate_to_partitions("aggregated_sensor_data", settings.aggregated_partition_granularity)
@@ -2,12 +2,15 @@ import json
 import asyncio
 import logging
 from paho.mqtt.client import Client
+from datetime import datetime
 from database import Database
+from quality import QualityMonitor
 from settings import get_settings
 from collections import defaultdict
 
 settings = get_settings()
 database = Database()
+quality_monitor = QualityMonitor(settings.interval_ms, settings.quality_stale_ms, settings.quality_clock_skew_ms)
 
 # Dictionary to hold aggregated data
 data_store = defaultdict(list)
@@ -24,9 +27,10 @@ def on_message(client, userdata, message):
         userdata: The private user data.
         message (paho.mqtt.client.MQTTMessage): The message received from the server.
     """
+    received_at = datetime.utcnow()
     data = json.loads(message.payload.decode())
     database.insert_data(data)
-    asyncio.run_coroutine_threadsafe(handle_message(data), loop)
+    asyncio.run_coroutine_threadsafe(handle_message(data, received_at), loop)
 
 def on_connect(client, userdata, flags, rc):
     """
@@ -41,31 +45,65 @@ def on_connect(client, userdata, flags, rc):
     logging.info(f"Connected with result code {rc}")
     client.subscribe(settings.mqtt.topic)
 
-async def handle_message(payload):
+async def handle_message(payload, received_at):
     """
-    Handle incoming MQTT messages by storing them in the data store.
+    Handle incoming MQTT messages by storing them in the data store and updating the quality counters.
 
     Args:
         payload (dict): The payload of the MQTT message.
+        received_at (datetime): The UTC time the message was received.
     """
     async with lock:
         sensor_id = int(payload.get('sensor_id'))
         data_store[sensor_id].append(payload)
+        quality_monitor.update(payload, received_at)
 
 async def aggregate_data():
     """
-    Aggregate sensor data every 1 minute and insert the aggregated data into the database.
+    Aggregate sensor data every 1 minute and insert the aggregated data, the quality
+    windows and the per-sensor statistics into the database.
     """
     while True:
         await asyncio.sleep(60)  # Wait for 1 minute
         async with lock:
+            stats_rows = []
             for sensor_id, readings in data_store.items():
                 if readings:
-                    avg_value = sum([r['value'] for r in readings]) / len(readings)
+                    values = [r['value'] for r in readings]
+                    avg_value = sum(values) / len(readings)
                     # Use the most recent reading for the additional fields
                     last_reading = readings[-1]
                     await insert_aggregated_data(sensor_id, avg_value, last_reading)
+                    timestamps = [datetime.fromisoformat(r['timestamp']) for r in readings]
+                    metadata = last_reading['metadata']
+                    stats_rows.append((
+                        sensor_id, metadata['location']['lat'], metadata['location']['lng'],
+                        metadata['unit'], metadata['type'], metadata['description'],
+                        len(readings), sum(values), min(values), max(values), min(timestamps), max(timestamps)
+                    ))
             data_store.clear()
+            quality_rows = quality_monitor.flush()
+        database.insert_quality_windows(quality_rows)
+        database.update_sensor_stats(stats_rows)
+
+async def maintain_partitions():
+    """
+    Periodically pre-create future partitions and drop expired ones for the raw and aggregated tables,
+    and delete expired quality windows.
+    """
+    while True:
+        # Rollups and partition DDL can take a while, so keep them off the event loop
+        await asyncio.to_thread(
+            database.maintain_partitions,
+            "sensor_data", settings.raw_partition_granularity, settings.raw_retention_days,
+            rollup=True, archive_stats=True
+        )
+        await asyncio.to_thread(
+            database.maintain_partitions,
+            "aggregated_sensor_data", settings.aggregated_partition_granularity, settings.aggregated_retention_days
+        )
+        await asyncio.to_thread(database.expire_quality_windows, settings.quality_retention_days)
+        await asyncio.sleep(settings.partition_maintenance_interval_s)
 
 async def insert_aggregated_data(sensor_id, avg_value, last_reading):
     """
@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+# Catch-all partition that future partitions are split off from
+MAX_PARTITION = "pmax"
+
+
+def period_start(day, granularity):
+    """
+    Return the first day of the partition period containing `day`.
+
+    Args:
+        day (date): Any day in the period.
+        granularity (str): Either "day" or "month".
+    """
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, granularity):
+    """
+    Return the first day of the partition period following the one starting at `start`.
+    """
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(start, granularity):
+    """
+    Return the partition name for the period starting at `start`, e.g. p20240614 or p202406.
+    """
+    return "p" + start.strftime("%Y%m" if granularity == "month" else "%Y%m%d")
+
+
+def parse_partition_name(name, granularity):
+    """
+    Return the first day of the period encoded in a partition name, or None for the catch-all partition.
+    """
+    if name == MAX_PARTITION:
+        return None
+    if granularity == "month":
+        return date(int(name[1:5]), int(name[5:7]), 1)
+    return date(int(name[1:5]), int(name[5:7]), int(name[7:9]))
+
+
+def partition_definition(start, granularity):
+    """
+    Return the RANGE partition definition for the period starting at `start`.
+    """
+    upper = next_period(start, granularity)
+    return f"PARTITION {partition_name(start, granularity)} VALUES LESS THAN (TO_DAYS('{upper.isoformat()}'))"
+
+
+def partition_definitions(first, last, granularity):
+    """
+    Return the partition definitions for every period from `first` up to and including `last`.
+    """
+    definitions = []
+    start = period_start(first, granularity)
+    while start <= last:
+        definitions.append(partition_definition(start, granularity))
+        start = next_period(start, granularity)
+    return definitions
+
+
+def partition_clause(first, last, granularity):
+    """
+    Return the full PARTITION BY clause covering `first`..`last` plus the catch-all partition.
+    """
+    definitions = partition_definitions(first, last, granularity)
+    definitions.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE")
+    return "PARTITION BY RANGE (TO_DAYS(timestamp)) (\n    " + ",\n    ".join(definitions) + "\n)"
@@ -0,0 +1,167 @@
+import json
+from collections import deque
+from datetime import datetime, timedelta
+
+# Readings re-sent within this many intervals are detected as duplicates, even across windows
+DUPLICATE_HISTORY_INTERVALS = 300
+
+
+class SensorQuality:
+    """
+    Incremental data-quality counters for a single sensor over one aggregation window.
+    """
+    def __init__(self, sensor_id, value_range, interval_ms):
+        """
+        Initialize the counters for a sensor.
+
+        Args:
+            sensor_id (int): The sensor ID.
+            value_range (list): The [min, max] range of valid values, or None if unknown.
+            interval_ms (int): The expected interval between readings in milliseconds.
+        """
+        self.sensor_id = sensor_id
+        self.value_range = value_range
+        self.interval_ms = interval_ms
+        # State carried across windows
+        self.last_timestamp = None
+        self.last_received_at = None
+        self.recent_timestamps = deque()
+        self.recent_timestamp_set = set()
+        self.reset()
+
+    def reset(self):
+        """
+        Reset the per-window counters.
+        """
+        self.received_count = 0
+        self.gap_count = 0
+        self.missing_count = 0
+        self.max_gap_ms = 0.0
+        self.out_of_range_count = 0
+        self.duplicate_count = 0
+        self.clock_skew_count = 0
+        self.max_clock_skew_ms = 0.0
+
+    def remember(self, timestamp):
+        """
+        Add a timestamp to the bounded history used for duplicate detection.
+
+        Timestamps older than DUPLICATE_HISTORY_INTERVALS intervals before the newest one are
+        forgotten, and the history never holds more than twice that many entries.
+        """
+        self.recent_timestamps.append(timestamp)
+        self.recent_timestamp_set.add(timestamp)
+        newest = max(timestamp, self.last_timestamp or timestamp)
+        horizon = newest - timedelta(milliseconds=DUPLICATE_HISTORY_INTERVALS * self.interval_ms)
+        while self.recent_timestamps and (
+            self.recent_timestamps[0] < horizon or len(self.recent_timestamps) > 2 * DUPLICATE_HISTORY_INTERVALS
+        ):
+            self.recent_timestamp_set.discard(self.recent_timestamps.popleft())
+
+    def update(self, timestamp, value, received_at, clock_skew_ms):
+        """
+        Update the counters with a single reading.
+
+        Args:
+            timestamp (datetime): The timestamp reported by the sensor.
+            value (float): The reading value.
+            received_at (datetime): The UTC time the reading was received by the ingester.
+            clock_skew_ms (int): Skew between sensor and ingester clocks above which a reading is flagged.
+        """
+        self.received_count += 1
+
+        if timestamp in self.recent_timestamp_set:
+            self.duplicate_count += 1
+            return
+        self.remember(timestamp)
+
+        if self.last_timestamp is not None and timestamp > self.last_timestamp:
+            delta_ms = (timestamp - self.last_timestamp).total_seconds() * 1000
+            # A gap is anything longer than two expected intervals
+            if delta_ms > 2 * self.interval_ms:
+                self.gap_count += 1
+                self.missing_count += int(delta_ms // self.interval_ms) - 1
+                self.max_gap_ms = max(self.max_gap_ms, delta_ms)
+
+        skew_ms = abs((received_at - timestamp).total_seconds() * 1000)
+        if skew_ms > clock_skew_ms:
+            self.clock_skew_count += 1
+        self.max_clock_skew_ms = max(self.max_clock_skew_ms, skew_ms)
+
+        if self.value_range is not None and not (self.value_range[0] <= value <= self.value_range[1]):
+            self.out_of_range_count += 1
+
+        if self.last_timestamp is None or timestamp > self.last_timestamp:
+            self.last_timestamp = timestamp
+        self.last_received_at = received_at
+
+
+class QualityMonitor:
+    """
+    A class to compute streaming data-quality metrics per sensor as readings arrive.
+    """
+    def __init__(self, interval_ms, stale_ms, clock_skew_ms, sensors_file="sensors.json"):
+        """
+        Initialize the monitor with the sensor ranges from the sensors file.
+
+        Args:
+            interval_ms (int): The expected interval between readings in milliseconds.
+            stale_ms (int): Time without readings after which a sensor is considered stale.
+            clock_skew_ms (int): Skew between sensor and ingester clocks above which a reading is flagged.
+            sensors_file (str): Path to the sensors configuration file.
+        """
+        self.interval_ms = interval_ms
+        self.stale_ms = stale_ms
+        self.clock_skew_ms = clock_skew_ms
+        with open(sensors_file) as sensors_json:
+            _sensors = json.load(sensors_json)
+            self.ranges = {int(k): v["range"] for k, v in _sensors.items()}
+        self.sensors = {
+            sensor_id: SensorQuality(sensor_id, value_range, interval_ms)
+            for sensor_id, value_range in self.ranges.items()
+        }
+        self.window_start = datetime.utcnow()
+
+    def update(self, payload, received_at):
+        """
+        Update the quality counters with a reading.
+
+        Args:
+            payload (dict): The payload of the MQTT message.
+            received_at (datetime): The UTC time the reading was received by the ingester.
+        """
+        sensor_id = int(payload['sensor_id'])
+        if sensor_id not in self.sensors:
+            self.sensors[sensor_id] = SensorQuality(sensor_id, self.ranges.get(sensor_id), self.interval_ms)
+        timestamp = datetime.fromisoformat(payload['timestamp'])
+        self.sensors[sensor_id].update(timestamp, payload['value'], received_at, self.clock_skew_ms)
+
+    def flush(self, window_end=None):
+        """
+        Close the current window and return one quality row per sensor.
+
+        Args:
+            window_end (datetime): The end of the window, defaults to the current UTC time.
+
+        Returns:
+            list: Tuples of (sensor_id, window_start, window_end, expected_count, received_count,
+                  missing_count, gap_count, max_gap_ms, stale, out_of_range_count, duplicate_count,
+                  clock_skew_count, max_clock_skew_ms).
+        """
+        window_end = window_end or datetime.utcnow()
+        window_ms = (window_end - self.window_start).total_seconds() * 1000
+        expected_count = int(window_ms // self.interval_ms)
+
+        rows = []
+        for sensor_id, sensor in self.sensors.items():
+            last_seen = sensor.last_received_at
+            stale = last_seen is None or (window_end - last_seen).total_seconds() * 1000 > self.stale_ms
+            rows.append((
+                sensor_id, self.window_start, window_end, expected_count, sensor.received_count,
+                sensor.missing_count, sensor.gap_count, sensor.max_gap_ms, stale,
+                sensor.out_of_range_count, sensor.duplicate_count,
+                sensor.clock_skew_count, sensor.max_clock_skew_ms
+            ))
+            sensor.reset()
+        self.window_start = window_end
+        return rows
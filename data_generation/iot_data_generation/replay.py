@@ -0,0 +1,140 @@
+import csv
+import gzip
+import json
+from itertools import islice
+from datetime import datetime
+from database import Database
+
+COLUMNS = ["sensor_id", "timestamp", "value", "lat", "lng", "unit", "type", "description"]
+
+
+def open_export(path):
+    """
+    Open an export file for streaming, transparently decompressing .gz files.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="")
+    return open(path, newline="")
+
+
+def read_export(path):
+    """
+    Stream readings from an export file one at a time.
+
+    JSON lines files may contain either MQTT payloads or flat sensor_data rows;
+    CSV files must have a header with the sensor_data columns.
+
+    Args:
+        path (str): Path to a .jsonl or .csv file, optionally gzipped.
+
+    Yields:
+        dict: One reading, either a payload or a flat row.
+    """
+    with open_export(path) as export:
+        if path.removesuffix(".gz").endswith(".csv"):
+            yield from csv.DictReader(export)
+        else:
+            for line in export:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def read_database(start=None, end=None, batch_size=10000):
+    """
+    Stream readings from the sensor_data table in timestamp order.
+
+    Rows are paged with short keyset queries on (timestamp, id), each on a fresh connection,
+    so no result set or read view stays open while the replay sleeps between readings.
+
+    Args:
+        start (datetime): Only replay readings at or after this time.
+        end (datetime): Only replay readings before this time.
+        batch_size (int): Number of rows fetched per query.
+
+    Yields:
+        dict: One flat sensor_data row.
+    """
+    database = Database()
+    last = None
+    while True:
+        clauses, params = [], []
+        if last:
+            # The plain timestamp bound lets MySQL prune partitions and range-scan the index
+            clauses.append("timestamp >= %s AND (timestamp, id) > (%s, %s)")
+            params += [last["timestamp"], last["timestamp"], last["id"]]
+        elif start:
+            clauses.append("timestamp >= %s")
+            params.append(start)
+        if end:
+            clauses.append("timestamp < %s")
+            params.append(end)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+        conn = database.create_connection()
+        if conn is None:
+            print("Error! cannot create the database connection.")
+            return
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                f"SELECT id, {', '.join(COLUMNS)} FROM sensor_data{where} ORDER BY timestamp, id LIMIT %s",
+                params + [batch_size]
+            )
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+
+
+def next_batch(readings, batch_size=1000):
+    """
+    Take the next batch of readings from a reading iterator.
+
+    Reading the iterator blocks on file or database I/O, so the replay calls this in a
+    worker thread instead of iterating the readings inside the event loop.
+
+    Args:
+        readings (iterator): Readings from read_export or read_database.
+        batch_size (int): Maximum number of readings in the batch.
+
+    Returns:
+        list: The readings, empty once the iterator is exhausted.
+    """
+    return list(islice(readings, batch_size))
+
+
+def parse_timestamp(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def to_payload(reading, timestamp):
+    """
+    Convert a reading into the payload format published by Sensor.generate.
+
+    Args:
+        reading (dict): A payload or a flat sensor_data row.
+        timestamp (datetime): The timestamp to publish the reading with.
+
+    Returns:
+        dict: The payload.
+    """
+    if "metadata" in reading:
+        return dict(reading, timestamp=timestamp.isoformat())
+    return {
+        "sensor_id": str(reading["sensor_id"]),
+        "timestamp": timestamp.isoformat(),
+        "value": float(reading["value"]),
+        "metadata": {
+            "location": {
+                "lat": float(reading["lat"]),
+                "lng": float(reading["lng"])
+            },
+            "unit": reading["unit"],
+            "type": reading["type"],
+            "description": reading["description"]
+        }
+    }
@@ -1,6 +1,6 @@
 import asyncio
 from generator import Generator
-from mqtt_handler import setup_mqtt, aggregate_data
+from mqtt_handler import setup_mqtt, aggregate_data, maintain_partitions
 
 if __name__ == "__main__":
     generator = Generator()
@@ -8,12 +8,13 @@ if __name__ == "__main__":
 
     async def main():
         """
-        Main asynchronous function to start data generation and aggregation.
+        Main asynchronous function to start data generation, aggregation and partition maintenance.
         """
-        # Run data generation and aggregation concurrently
+        # Run data generation, aggregation and partition maintenance concurrently
         await asyncio.gather(
-            generator.generate(),
-            aggregate_data()
+            generator.replay() if generator.settings.replay_source else generator.generate(),
+            aggregate_data(),
+            maintain_partitions()
         )
 
     # Set up MQTT client
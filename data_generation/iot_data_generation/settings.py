@@ -20,6 +20,19 @@ class Settings():
     mysql: MySQLSettings = MySQLSettings()
     interval_ms: int = int(os.getenv('INTERVAL_MS', '1000'))
     logging_level: int = int(os.getenv('LOGGING_LEVEL', '30'))
+    quality_stale_ms: int = int(os.getenv('QUALITY_STALE_MS', '5000'))
+    quality_clock_skew_ms: int = int(os.getenv('QUALITY_CLOCK_SKEW_MS', '2000'))
+    raw_partition_granularity: str = os.getenv('RAW_PARTITION_GRANULARITY', 'day')
+    aggregated_partition_granularity: str = os.getenv('AGGREGATED_PARTITION_GRANULARITY', 'month')
+    raw_retention_days: int = int(os.getenv('RAW_RETENTION_DAYS', '90'))
+    aggregated_retention_days: int = int(os.getenv('AGGREGATED_RETENTION_DAYS', '365'))
+    quality_retention_days: int = int(os.getenv('QUALITY_RETENTION_DAYS', '30'))
+    partition_precreate: int = int(os.getenv('PARTITION_PRECREATE', '3'))
+    partition_maintenance_interval_s: int = int(os.getenv('PARTITION_MAINTENANCE_INTERVAL_S', '3600'))
+    replay_source: str = os.getenv('REPLAY_SOURCE', '')
+    replay_speed: float = float(os.getenv('REPLAY_SPEED', '1'))
+    replay_start: str = os.getenv('REPLAY_START')
+    replay_end: str = os.getenv('REPLAY_END')
 
 def get_settings() -> Settings:
     return Settings()